@@ -1,5 +1,8 @@
+import json
+import math
 import time
 
+import cachey
 import dask
 import numpy as np
 import pytest
@@ -8,7 +11,19 @@ from numcodecs import Blosc, Delta
 
 import xpublish  # noqa: F401
 from xpublish.utils.cache import CostTimer
-from xpublish.utils.zarr import create_zmetadata, encode_chunk, get_data_chunk
+from xpublish.utils.zarr import (
+    DASK_TASK_NBYTES,
+    NUMERIC_COMPRESSOR,
+    create_zmetadata,
+    dumps_zmetadata,
+    encode_chunk,
+    encode_chunks,
+    get_chunk_encoding,
+    get_data_chunk,
+    jsonify_zmetadata,
+)
+
+from .utils import BatchDelta
 
 
 def test_dask_chunks_become_zarr_chunks():
@@ -22,6 +37,110 @@ def test_dask_chunks_become_zarr_chunks():
     assert zmeta['metadata']['bar/.zarray']['chunks'] == list(data2.shape)
 
 
+def test_default_compressor():
+    compressor = Blosc(cname='lz4', clevel=1)
+    ds = xr.Dataset(
+        {
+            'foo': (['x'], np.arange(10.0)),
+            'bar': (['x'], np.array(list('abcdefghij'))),
+            'baz': (['x'], np.arange(10), {}, {'compressor': compressor}),
+        }
+    )
+    zmeta = create_zmetadata(ds)
+
+    assert zmeta['metadata']['foo/.zarray']['compressor'] == NUMERIC_COMPRESSOR
+    assert zmeta['metadata']['bar/.zarray']['compressor'] != NUMERIC_COMPRESSOR
+    assert zmeta['metadata']['baz/.zarray']['compressor'] == compressor
+
+
+def test_zattrs_encoding():
+    attrs = {
+        'str': 'text',
+        'int': 1,
+        'float': 1.5,
+        'np_float': np.float32(2.5),
+        'np_array': np.array([1, 2]),
+        'list': [1, 2],
+    }
+    ds = xr.Dataset({'foo': (['x'], np.arange(2), attrs)}, attrs=attrs)
+    zmeta = create_zmetadata(ds)
+
+    expected = {**attrs, 'np_float': 2.5, 'np_array': [1, 2]}
+    assert zmeta['metadata']['.zattrs'] == expected
+    assert zmeta['metadata']['foo/.zattrs'] == {**expected, '_ARRAY_DIMENSIONS': ['x']}
+    assert type(zmeta['metadata']['.zattrs']['np_float']) is float
+
+
+def test_fill_value_attrs_untouched():
+    var = xr.Variable(['x'], np.arange(10.0), {'_FillValue': -9999.0})
+    ds = xr.Dataset({'foo': var})
+
+    zmeta = create_zmetadata(ds)
+    assert zmeta['metadata']['foo/.zarray']['fill_value'] == -9999.0
+    assert '_FillValue' not in zmeta['metadata']['foo/.zattrs']
+    assert var.attrs == {'_FillValue': -9999.0}
+
+    # metadata stays the same when created again
+    assert create_zmetadata(ds) == zmeta
+
+
+def test_fill_value_shared_across_variables():
+    ds = xr.Dataset(
+        {
+            'a': ('x', np.arange(3.0), {'_FillValue': 0}),
+            'b': ('x', np.arange(3), {'_FillValue': 0}),
+            'c': ('x', np.arange(3.0), {'_FillValue': np.nan}),
+            'd': ('x', np.arange(3, dtype='f4'), {'_FillValue': np.float32(np.nan)}),
+            'e': ('x', np.arange(3.0), {'_FillValue': np.array(-1.0)}),
+            'f': ('x', np.arange(3)),
+        }
+    )
+    zmeta = create_zmetadata(ds)['metadata']
+
+    fill_values = [zmeta[f'{name}/.zarray']['fill_value'] for name in 'abcdef']
+    assert fill_values == [0.0, 0, 'NaN', 'NaN', -1.0, None]
+    assert isinstance(fill_values[0], float)
+    assert isinstance(fill_values[1], int)
+
+
+def test_fill_value_signed_zero():
+    ds = xr.Dataset(
+        {
+            'a': ('x', np.arange(3.0), {'_FillValue': 0.0}),
+            'b': ('x', np.arange(3.0), {'_FillValue': -0.0}),
+        }
+    )
+    zmeta = create_zmetadata(ds)['metadata']
+
+    assert math.copysign(1, zmeta['a/.zarray']['fill_value']) == 1
+    assert math.copysign(1, zmeta['b/.zarray']['fill_value']) == -1
+
+
+def test_jsonify_zmetadata_leaves_zmetadata_untouched():
+    ds = xr.Dataset({'foo': (['x'], np.arange(10))})
+    zmeta = create_zmetadata(ds)
+    compressor = zmeta['metadata']['foo/.zarray']['compressor']
+
+    zjson = jsonify_zmetadata(ds, zmeta)
+
+    assert zjson['metadata']['foo/.zarray']['compressor'] == compressor.get_config()
+    assert zmeta['metadata']['foo/.zarray']['compressor'] is compressor
+
+
+@pytest.mark.parametrize(
+    'zjson',
+    [
+        {'metadata': {'foo/.zattrs': {'a': 1, 'b': 'text', 'c': [1.5, 2.5]}}},
+        {'metadata': {'foo/.zattrs': {'a': np.float32(1.5), 'b': np.int64(2)}}},
+        {'metadata': {'foo/.zattrs': {'a': np.nan, 'b': [1.0, np.inf]}}},
+    ],
+)
+def test_dumps_zmetadata(zjson):
+    actual = json.loads(dumps_zmetadata(zjson))
+    expected = json.loads(json.dumps(zjson, default=lambda v: v.item()))
+    assert json.dumps(actual) == json.dumps(expected)
+
+
 def test_single_dataset_raise(airtemp_ds):
     """A single dataset should throw a TypeError if it's passed to
     xpublish.Rest rather than xpublish.SingleDatasetRest.
@@ -73,6 +192,62 @@ def test_get_data_chunk_numpy():
     excinfo.match(r'Invalid chunk_id for numpy array*')
 
 
+@pytest.mark.parametrize('chunk_id', ['0.0', '1.1', '2.3'])
+def test_get_data_chunk_dask_graph(chunk_id):
+    data = dask.array.arange(300).reshape((15, 20)).rechunk((6, 6)) * 2
+    out_shape = (6, 6)
+
+    expected = data.blocks[tuple(map(int, chunk_id.split('.')))].compute()
+    actual = get_data_chunk(data, chunk_id, out_shape, dsk=dict(data.__dask_graph__()))
+    assert actual.shape == out_shape
+    np.testing.assert_equal(actual[: expected.shape[0], : expected.shape[1]], expected)
+
+
+@pytest.mark.parametrize('available_bytes', [1e3, 1e6])
+def test_get_chunk_encoding_graph_size(available_bytes):
+    data = dask.array.arange(300).reshape((15, 20)).rechunk((6, 6)) * 2
+    ds = xr.Dataset({'foo': (['x', 'y'], data)})
+    cache = cachey.Cache(available_bytes=available_bytes)
+
+    _, dsk, _, _, chunks = get_chunk_encoding(ds, cache, 'foo')
+    assert chunks == (6, 6)
+
+    graph_nbytes = len(data.__dask_graph__()) * DASK_TASK_NBYTES
+    if graph_nbytes <= available_bytes / 10:
+        assert dsk == dict(data.__dask_graph__())
+        assert cache.nbytes['/.chunk_encoding/foo'] == graph_nbytes
+    else:
+        assert dsk is None
+    assert '/.chunk_encoding/foo' in cache
+
+    # both ways give the same chunks
+    actual = get_data_chunk(data, '1.1', chunks, dsk=dsk)
+    np.testing.assert_equal(actual, data.blocks[1, 1].compute())
+
+
+def test_get_data_chunk_dask_graph_scalar():
+    data = dask.array.from_array(np.array(3.5))
+    actual = get_data_chunk(data, '0', (), dsk=dict(data.__dask_graph__()))
+    np.testing.assert_equal(actual, np.array(3.5))
+
+
+def test_get_data_chunk_invalid_chunk_id_raises():
+    data = dask.array.zeros((10, 20), chunks=(5, 10))
+
+    with pytest.raises(ValueError) as excinfo:
+        _ = get_data_chunk(data, '0.0.0', (5, 10))
+    excinfo.match(r'Invalid chunk_id for an array with 2 dimensions*')
+
+
+@pytest.mark.parametrize('chunk_id', ['2.0', '0.-1'])
+def test_get_data_chunk_out_of_range_chunk_id_raises(chunk_id):
+    data = dask.array.zeros((10, 20), chunks=(5, 10))
+
+    with pytest.raises(ValueError) as excinfo:
+        _ = get_data_chunk(data, chunk_id, (5, 10), dsk=dict(data.__dask_graph__()))
+    excinfo.match(r'Invalid chunk_id for an array with \(2, 2\) chunks*')
+
+
 def test_get_data_chunk_numpy_edge_chunk():
     # 1d case
     out_shape = (12,)
@@ -88,6 +263,20 @@ def test_get_data_chunk_numpy_edge_chunk():
     np.testing.assert_equal(data, actual[:2, :])
 
 
+@pytest.mark.parametrize(
+    'shape, out_shape',
+    [((2, 5, 4), (3, 5, 4)), ((3, 5, 3), (3, 5, 4)), ((2, 4, 4), (3, 5, 4))],
+)
+@pytest.mark.parametrize('order', ['C', 'F'])
+def test_get_data_chunk_dask_edge_chunk(shape, out_shape, order):
+    values = np.asarray(np.arange(np.prod(shape)).reshape(shape), order=order)
+    data = dask.array.from_array(values, chunks=shape)
+
+    actual = get_data_chunk(data, '0.0.0', out_shape)
+    assert actual.shape == out_shape
+    np.testing.assert_equal(actual[tuple(map(slice, shape))], values)
+
+
 def test_init_accessor_twice_raises():
     ds = xr.Dataset({'foo': (['x'], [1, 2, 3])})
     ds.rest(app_kws={'foo': 'bar'})
@@ -110,12 +299,74 @@ def test_encode_chunk(filters, compressor):
     assert isinstance(ebuf, bytes)
 
 
+@pytest.mark.parametrize(
+    'chunk',
+    [
+        np.arange(10),
+        np.arange(20).reshape((4, 5))[:, 1:3],
+        np.array(3.5),
+        np.array(['2020-01-01', '2020-01-02'], dtype='datetime64[ns]'),
+    ],
+)
+def test_encode_chunk_array_without_copy(chunk):
+    ebuf = encode_chunk(chunk)
+    assert isinstance(ebuf, memoryview)
+    assert ebuf.tobytes() == chunk.tobytes()
+
+    compressor = Blosc(cname='zstd', clevel=1, shuffle=Blosc.SHUFFLE)
+    ebuf = encode_chunk(chunk, compressor=compressor)
+    assert compressor.decode(ebuf) == chunk.tobytes()
+
+
+def test_encode_chunk_array_codec_output():
+    chunk = np.arange(10)
+    compressor = Delta(dtype='i8')
+    ebuf = encode_chunk(chunk, compressor=compressor)
+    assert isinstance(ebuf, memoryview)
+    assert ebuf.tobytes() == compressor.encode(chunk).tobytes()
+
+
+class BatchCompressor(Blosc):
+    """Blosc compressor with a batch encoding method."""
+
+    def encode_batch(self, bufs):
+        """Encode several buffers at once, counting the batches."""
+        self.batches = getattr(self, 'batches', 0) + 1
+        return [self.encode(buf) for buf in bufs]
+
+
+@pytest.mark.parametrize(
+    'filters, compressor',
+    [
+        (None, None),
+        (None, Blosc(cname='zstd', clevel=1, shuffle=Blosc.SHUFFLE)),
+        ([Delta(dtype='i8')], Blosc(cname='zstd', clevel=1, shuffle=Blosc.SHUFFLE)),
+        (None, BatchCompressor(cname='zstd', clevel=1, shuffle=Blosc.SHUFFLE)),
+        (None, BatchDelta(dtype='i8')),
+    ],
+)
+def test_encode_chunks(filters, compressor):
+    chunks = [np.arange(10), np.arange(10, 20), np.arange(20, 30)]
+    actual = encode_chunks(chunks, filters=filters, compressor=compressor)
+    assert [len(ebuf) for ebuf in actual] == [len(bytes(ebuf)) for ebuf in actual]
+    expected = [encode_chunk(chunk, filters=filters, compressor=compressor) for chunk in chunks]
+    assert [bytes(ebuf) for ebuf in actual] == [bytes(ebuf) for ebuf in expected]
+
+    if isinstance(compressor, BatchCompressor):
+        assert compressor.batches == 1
+
+
 def test_encode_object_array_raises():
     buf = np.arange(10).astype('O')
     with pytest.raises(RuntimeError):
         encode_chunk(buf)
 
 
+def test_encode_chunk_bytes():
+    buf = np.arange(10, dtype='u1').tobytes()
+    assert bytes(encode_chunk(buf)) == buf
+
+
 def test_cache_timer():
     with CostTimer() as ct:
         time.sleep(1)
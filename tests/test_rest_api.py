@@ -1,16 +1,22 @@
 import json
+import struct
 
+import numpy as np
 import pytest
 import uvicorn
 import xarray as xr
 from fastapi import APIRouter, Depends
+from numcodecs import Delta
 from starlette.testclient import TestClient
 
 import xpublish  # noqa: F401
 from xpublish import Plugin, Rest, SingleDatasetRest, hookimpl, hookspec
 from xpublish.dependencies import get_dataset
+from xpublish.plugins.included.zarr import ZarrPlugin
 from xpublish.utils.zarr import create_zmetadata, jsonify_zmetadata
 
+from .utils import BatchDelta
+
 
 @pytest.fixture(scope='function')
 def airtemp_rest(airtemp_ds):
@@ -356,6 +362,127 @@ def test_cache(airtemp_ds):
     assert response1.content == response2.content
 
 
+def test_get_chunk_streamed():
+    data = np.arange(100)
+    ds = xr.Dataset({'var': ('x', data, {}, {'compressor': None})})
+    rest = SingleDatasetRest(
+        ds, plugins={'zarr': ZarrPlugin(stream_threshold=16, stream_block_size=64)}
+    )
+
+    client = TestClient(rest.app)
+
+    response = client.get('/zarr/var/0')
+    assert response.status_code == 200
+    assert response.headers['content-length'] == str(data.nbytes)
+    assert response.content == data.tobytes()
+
+
+def test_get_chunk_array_codec_output():
+    data = np.arange(10)
+    compressor = Delta(dtype='i8')
+    ds = xr.Dataset({'var': ('x', data, {}, {'compressor': compressor})})
+
+    client = TestClient(SingleDatasetRest(ds).app)
+
+    response = client.get('/zarr/var/0')
+    assert response.status_code == 200
+    assert response.content == compressor.encode(data).tobytes()
+
+
+def test_get_chunks_batch():
+    data = np.arange(100).reshape((10, 10))
+    ds = xr.Dataset({'var': (('x', 'y'), data)}).chunk({'x': 4, 'y': 5})
+
+    client = TestClient(SingleDatasetRest(ds).app)
+
+    chunks = ['0.0', '2.1', '1.0', '0.0']
+    response = client.post('/zarr/var/_batch', json=chunks)
+    assert response.status_code == 200
+
+    body = response.content
+    assert response.headers['content-length'] == str(len(body))
+    for chunk in chunks:
+        (length,) = struct.unpack('<Q', body[:8])
+        assert body[8 : 8 + length] == client.get(f'/zarr/var/{chunk}').content
+        body = body[8 + length :]
+    assert body == b''
+
+
+@pytest.mark.parametrize('chunk', ['a.0', '0', '0.0.0', '9.9', '0.-1', 'chunk_encoding'])
+@pytest.mark.parametrize('dask', [True, False])
+def test_get_chunks_batch_invalid_chunk_raises_400(chunk, dask):
+    data = np.arange(100).reshape((10, 10))
+    ds = xr.Dataset({'var': (('x', 'y'), data)})
+    if dask:
+        ds = ds.chunk({'x': 4, 'y': 5})
+
+    client = TestClient(SingleDatasetRest(ds).app)
+
+    # cache the chunk encoding and a chunk first
+    assert client.get('/zarr/var/0.0').status_code == 200
+
+    response = client.post('/zarr/var/_batch', json=['0.0', chunk])
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('chunk', ['a.0', '0', '0.0.0', '9.9', '0.-1', 'chunk_encoding', '.zmetadata'])
+@pytest.mark.parametrize('dask', [True, False])
+def test_get_invalid_chunk_raises_400(chunk, dask):
+    data = np.arange(100).reshape((10, 10))
+    ds = xr.Dataset({'var': (('x', 'y'), data)})
+    if dask:
+        ds = ds.chunk({'x': 4, 'y': 5})
+
+    client = TestClient(SingleDatasetRest(ds).app)
+
+    # cache the chunk encoding and a chunk first
+    assert client.get('/zarr/var/0.0').status_code == 200
+
+    response = client.get(f'/zarr/var/{chunk}')
+    assert response.status_code == 400
+
+
+def test_get_chunks_batch_too_many_chunks_raises_413():
+    data = np.arange(100).reshape((10, 10))
+    ds = xr.Dataset({'var': (('x', 'y'), data)}).chunk({'x': 4, 'y': 5})
+    rest = SingleDatasetRest(ds, plugins={'zarr': ZarrPlugin(max_batch_chunks=2)})
+
+    client = TestClient(rest.app)
+
+    response = client.post('/zarr/var/_batch', json=['0.0', '0.1'])
+    assert response.status_code == 200
+
+    response = client.post('/zarr/var/_batch', json=['0.0', '0.1', '1.0'])
+    assert response.status_code == 413
+
+
+def test_get_chunks_batch_numpy_nonzero_chunk_raises_400():
+    ds = xr.Dataset({'var': (('x', 'y'), np.arange(100).reshape((10, 10)))})
+
+    client = TestClient(SingleDatasetRest(ds).app)
+
+    response = client.post('/zarr/var/_batch', json=['0.0', '1.0'])
+    assert response.status_code == 400
+
+
+def test_get_chunks_batch_array_codec_output():
+    data = np.arange(20)
+    compressor = BatchDelta(dtype='i8')
+    ds = xr.Dataset({'var': ('x', data, {}, {'compressor': compressor})}).chunk({'x': 10})
+
+    client = TestClient(SingleDatasetRest(ds).app)
+
+    response = client.post('/zarr/var/_batch', json=['0', '1'])
+    assert response.status_code == 200
+    (length,) = struct.unpack('<Q', response.content[:8])
+    assert length == 10 * data.itemsize
+
+    # served from the chunks cached by the batch request
+    response = client.get('/zarr/var/1')
+    assert response.status_code == 200
+    assert response.content == compressor.encode(data[10:]).tobytes()
+
+
 def test_rest_accessor(airtemp_ds):
     client = TestClient(airtemp_ds.rest.app)
 
@@ -409,6 +536,54 @@ def test_ds_dict_cache(ds_dict):
     assert 'ds2/.zmetadata' in rest.cache
 
 
+def test_ds_dict_chunk_cache_per_dataset(ds_dict):
+    rest = Rest(ds_dict, cache_kws={'available_bytes': 1e9})
+
+    client = TestClient(rest.app)
+
+    response1 = client.get('/datasets/ds1/zarr/var/0')
+    response2 = client.get('/datasets/ds2/zarr/var/0')
+    assert response1.status_code == 200
+    assert response2.status_code == 200
+    assert response1.content != response2.content
+
+    # only the encoded bytes are cached, not the responses
+    assert bytes(rest.cache.get('ds1/var/0')) == response1.content
+    assert bytes(rest.cache.get('ds2/var/0')) == response2.content
+
+
+def test_ds_dict_chunk_variable_metadata_only(ds_dict):
+    rest = Rest(ds_dict, cache_kws={'available_bytes': 1e9})
+
+    client = TestClient(rest.app)
+
+    response = client.get('/datasets/ds1/zarr/var/0')
+    assert response.status_code == 200
+    assert 'ds1/.zmetadata/var' in rest.cache
+    assert 'ds1/.chunk_encoding/var' in rest.cache
+    assert 'ds1/.zmetadata' not in rest.cache
+    assert 'ds1/zvariables' not in rest.cache
+
+    response = client.get('/datasets/ds1/zarr/var/.zarray')
+    assert response.status_code == 200
+    assert response.json()['chunks'] == [3]
+
+
+def test_ds_dict_zmetadata_cache(ds_dict):
+    rest = Rest(ds_dict, cache_kws={'available_bytes': 1e9})
+
+    client = TestClient(rest.app)
+
+    response1 = client.get('/datasets/ds1/zarr/.zmetadata')
+    assert response1.status_code == 200
+    assert response1.headers['content-type'] == 'application/json'
+    assert 'ds1/.zmetadata.json' in rest.cache
+
+    response2 = client.get('/datasets/ds1/zarr/.zmetadata')
+    assert response2.status_code == 200
+    assert response1.content == response2.content
+
+
 def test_single_dataset_openapi_override(airtemp_rest):
     openapi_schema = airtemp_rest.app.openapi()
 
@@ -5,10 +5,20 @@ import pytest
 import xarray as xr
 
 from xpublish import SingleDatasetRest
+from xpublish.plugins.included.zarr import ZarrPlugin
+from xpublish.utils.zarr import NUMERIC_COMPRESSOR, load_source_zmetadata
 
 from .utils import TestMapper, create_dataset
 
 
+def with_numeric_compressor(ds):
+    """All variables of the test datasets are numeric once encoded."""
+    ds = ds.copy()
+    for var in ds.variables.values():
+        var.encoding['compressor'] = NUMERIC_COMPRESSOR
+    return ds
+
+
 @pytest.mark.parametrize(
     'start, end, freq, nlats, nlons, var_const, calendar, use_cftime',
     [
@@ -32,7 +42,7 @@ def test_zmetadata_identical(start, end, freq, nlats, nlons, var_const, calendar
 
     ds = ds.chunk(ds.dims)
     zarr_dict = {}
-    ds.to_zarr(zarr_dict, consolidated=True)
+    with_numeric_compressor(ds).to_zarr(zarr_dict, consolidated=True)
     mapper = TestMapper(SingleDatasetRest(ds).app)
     actual = json.loads(mapper['.zmetadata'].decode())
     expected = json.loads(zarr_dict['.zmetadata'].decode())
@@ -74,7 +84,7 @@ def test_zmetadata_identical_coords(
 
     ds = ds.chunk(ds.dims)
     zarr_dict = {}
-    ds.to_zarr(zarr_dict, consolidated=True)
+    with_numeric_compressor(ds).to_zarr(zarr_dict, consolidated=True)
     mapper = TestMapper(SingleDatasetRest(ds).app)
     actual = json.loads(mapper['.zmetadata'].decode())
     expected = json.loads(zarr_dict['.zmetadata'].decode())
@@ -116,7 +126,7 @@ def test_zmetadata_identical_coords_sorted(
 
     ds = ds.chunk(ds.dims)
     zarr_dict = {}
-    ds.to_zarr(zarr_dict, consolidated=True)
+    with_numeric_compressor(ds).to_zarr(zarr_dict, consolidated=True)
     mapper = TestMapper(SingleDatasetRest(ds).app)
     actual = json.loads(mapper['.zmetadata'].decode())
     expected = json.loads(zarr_dict['.zmetadata'].decode())
@@ -266,3 +276,31 @@ def test_scalar_variable():
     actual = xr.open_zarr(mapper, consolidated=True)
 
     xr.testing.assert_identical(actual, ds)
+
+
+def test_source_zmetadata(tmp_path):
+    ds = create_dataset(start='2018-01-01', end='2018-12-31', nlats=15, nlons=30)
+    ds = ds.chunk({'time': 6})
+    ds.to_zarr(tmp_path / 'source.zarr', consolidated=True)
+    expected = json.loads((tmp_path / 'source.zarr' / '.zmetadata').read_text())
+
+    source_ds = xr.open_zarr(tmp_path / 'source.zarr', consolidated=True)
+    rest = SingleDatasetRest(source_ds, plugins={'zarr': ZarrPlugin(use_source_zmetadata=True)})
+    mapper = TestMapper(rest.app)
+    actual = json.loads(mapper['.zmetadata'].decode())
+    assert rest.cache.get('/.zmetadata.source') is True
+    assert '/zvariables' not in rest.cache
+
+    assert json.dumps(actual, sort_keys=True) == json.dumps(expected, sort_keys=True)
+    xr.testing.assert_identical(xr.open_zarr(mapper, consolidated=True), source_ds)
+
+
+def test_source_zmetadata_mismatch(tmp_path):
+    ds = create_dataset(start='2018-01-01', end='2018-12-31', nlats=15, nlons=30)
+    ds.to_zarr(tmp_path / 'source.zarr', consolidated=True)
+    source_ds = xr.open_zarr(tmp_path / 'source.zarr', consolidated=True)
+
+    assert load_source_zmetadata(source_ds) is not None
+    assert load_source_zmetadata(source_ds.isel(time=slice(0, 4))) is None
+    assert load_source_zmetadata(source_ds[['tmin']]) is None
+    assert load_source_zmetadata(ds) is None
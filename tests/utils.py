@@ -4,6 +4,7 @@ from operator import mul
 import numpy as np
 import pandas as pd
 import xarray as xr
+from numcodecs import Delta
 from starlette.testclient import TestClient
 from zarr.storage import BaseStore
 
@@ -33,6 +34,14 @@ class TestMapper(TestClient, BaseStore):
         return NotImplemented
 
 
+class BatchDelta(Delta):
+    """Delta codec with a batch encoding method that returns arrays."""
+
+    def encode_batch(self, bufs):
+        """Encode several buffers at once."""
+        return [self.encode(buf) for buf in bufs]
+
+
 def create_dataset(
     start='2018-01',
     end='2020-12',
@@ -1,10 +1,11 @@
 import logging
-from typing import Sequence
+import struct
+from typing import List, Sequence
 
 import cachey  # type: ignore
 import xarray as xr
-from fastapi import APIRouter, Depends, HTTPException, Path
-from starlette.responses import Response  # type: ignore
+from fastapi import APIRouter, Body, Depends, HTTPException, Path
+from starlette.responses import Response, StreamingResponse  # type: ignore
 from zarr.storage import array_meta_key, attrs_key, group_meta_key  # type: ignore
 
 from xpublish.utils.api import JSONResponse
@@ -13,17 +14,38 @@ from ...utils.api import DATASET_ID_ATTR_KEY
 from ...utils.cache import CostTimer
 from ...utils.zarr import (
     ZARR_METADATA_KEY,
+    _check_chunk_id,
+    create_group_zmetadata,
     encode_chunk,
+    encode_chunks,
+    get_chunk_encoding,
     get_data_chunk,
+    get_source_zmetadata,
+    get_variable_zmetadata,
     get_zmetadata,
-    get_zvariables,
-    jsonify_zmetadata,
+    get_zmetadata_json,
 )
 from .. import Dependencies, Plugin, hookimpl
 
 logger = logging.getLogger('zarr_api')
 
 
+async def _iter_blocks(buf: memoryview, block_size: int):
+    """Yield zero-copy slices of a buffer.
+
+    Starlette sends ``memoryview`` blocks as they are since 0.38.0.
+    """
+    for start in range(0, len(buf), block_size):
+        yield buf[start : start + block_size]
+
+
+async def _iter_length_prefixed(bufs: List[memoryview]):
+    """Yield each buffer preceded by its length as an unsigned 64 bit little-endian integer."""
+    for buf in bufs:
+        yield struct.pack('<Q', len(buf))
+        yield buf
+
+
 class ZarrPlugin(Plugin):
     """Adds Zarr-like accessing endpoints for datasets."""
 
@@ -32,6 +54,18 @@ class ZarrPlugin(Plugin):
     dataset_router_prefix: str = '/zarr'
     dataset_router_tags: Sequence[str] = ['zarr']
 
+    # encoded chunks larger than this (in bytes) are streamed in blocks of stream_block_size
+    stream_threshold: int = 1024 * 1024
+    stream_block_size: int = 64 * 1024
+
+    # maximum number of chunks requested at once from the batch endpoint, the raw chunks
+    # missing from the cache are all held in memory while they are encoded
+    max_batch_chunks: int = 128
+
+    # serve the consolidated metadata of the zarr store datasets were opened from, when it
+    # still matches them. Only enable this when dataset attributes are not modified.
+    use_source_zmetadata: bool = False
+
     @hookimpl
     def dataset_router(self, deps: Dependencies) -> APIRouter:  # noqa: D102
         router = APIRouter(
@@ -45,34 +79,86 @@ class ZarrPlugin(Plugin):
             cache=Depends(deps.cache),
         ) -> dict:
             """Consolidated Zarr metadata."""
-            zvariables = get_zvariables(dataset, cache)
-            zmetadata = get_zmetadata(dataset, cache, zvariables)
+            if self.use_source_zmetadata:
+                get_source_zmetadata(dataset, cache)
+
+            zmetadata = get_zmetadata(dataset, cache)
 
-            zjson = jsonify_zmetadata(dataset, zmetadata)
+            zjson = get_zmetadata_json(dataset, cache, zmetadata)
 
-            return JSONResponse(zjson)
+            return Response(zjson, media_type='application/json')
 
         @router.get(f'/{group_meta_key}')
         def get_zarr_group(
             dataset=Depends(deps.dataset),
-            cache=Depends(deps.cache),
         ) -> dict:
             """Zarr group data."""
-            zvariables = get_zvariables(dataset, cache)
-            zmetadata = get_zmetadata(dataset, cache, zvariables)
-
-            return JSONResponse(zmetadata['metadata'][group_meta_key])
+            return JSONResponse(create_group_zmetadata(dataset)[group_meta_key])
 
         @router.get(f'/{attrs_key}')
         def get_zarr_attrs(
             dataset=Depends(deps.dataset),
-            cache=Depends(deps.cache),
         ) -> dict:
             """Zarr attributes."""
-            zvariables = get_zvariables(dataset, cache)
-            zmetadata = get_zmetadata(dataset, cache, zvariables)
+            return JSONResponse(create_group_zmetadata(dataset)[attrs_key])
+
+        @router.post('/{var}/_batch')
+        def get_variable_chunks(
+            var: str = Path(description='Variable in dataset'),
+            chunks: List[str] = Body(description='Zarr chunks'),
+            dataset: xr.Dataset = Depends(deps.dataset),
+            cache: cachey.Cache = Depends(deps.cache),
+        ):
+            """Get several zarr array chunks of a variable at once.
 
-            return JSONResponse(zmetadata['metadata'][attrs_key])
+            The encoded chunks are returned in the requested order, each one prefixed
+            with its length in bytes as an unsigned 64 bit little-endian integer.
+            Chunks missing from the cache are encoded together.
+
+            """
+            if len(chunks) > self.max_batch_chunks:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f'At most {self.max_batch_chunks} chunks can be requested at once',
+                )
+
+            if self.use_source_zmetadata:
+                get_source_zmetadata(dataset, cache)
+
+            data, dsk, filters, compressor, out_shape = get_chunk_encoding(dataset, cache, var)
+
+            try:
+                for chunk in chunks:
+                    _check_chunk_id(data, chunk)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e)) from e
+
+            dataset_id = dataset.attrs.get(DATASET_ID_ATTR_KEY, '')
+            echunks = {}
+            for chunk in chunks:
+                echunks[chunk] = cache.get(dataset_id + '/' + f'{var}/{chunk}')
+
+            missing = [chunk for chunk, echunk in echunks.items() if echunk is None]
+            if missing:
+                with CostTimer() as ct:
+                    data_chunks = [
+                        get_data_chunk(data, chunk, out_shape, dsk=dsk) for chunk in missing
+                    ]
+                    encoded = encode_chunks(data_chunks, filters=filters, compressor=compressor)
+
+                for chunk, echunk in zip(missing, encoded):
+                    echunks[chunk] = echunk
+                    cache_key = dataset_id + '/' + f'{var}/{chunk}'
+                    cache.put(cache_key, echunk, ct.time / len(missing), len(echunk))
+
+            bufs = [memoryview(echunks[chunk]).cast('B') for chunk in chunks]
+            content_length = sum(8 + len(buf) for buf in bufs)
+
+            return StreamingResponse(
+                _iter_length_prefixed(bufs),
+                media_type='application/octet-stream',
+                headers={'Content-Length': str(content_length)},
+            )
 
         @router.get('/{var}/{chunk}')
         def get_variable_chunk(
@@ -83,50 +169,57 @@ class ZarrPlugin(Plugin):
         ):
             """Get a zarr array chunk.
 
-            This will return cached responses when available.
+            This will return cached chunks when available.
 
             """
-            zvariables = get_zvariables(dataset, cache)
-            zmetadata = get_zmetadata(dataset, cache, zvariables)
+            if self.use_source_zmetadata:
+                get_source_zmetadata(dataset, cache)
 
             # First check that this request wasn't for variable metadata
-            if array_meta_key in chunk:
-                return zmetadata['metadata'][f'{var}/{array_meta_key}']
-            elif attrs_key in chunk:
-                return JSONResponse(zmetadata['metadata'][f'{var}/{attrs_key}'])
-            elif group_meta_key in chunk:
+            if chunk == array_meta_key:
+                return get_variable_zmetadata(dataset, cache, var)[array_meta_key]
+            elif chunk == attrs_key:
+                return JSONResponse(get_variable_zmetadata(dataset, cache, var)[attrs_key])
+            elif chunk == group_meta_key:
                 raise HTTPException(status_code=404, detail='No subgroups')
             else:
                 logger.debug('var is %s', var)
                 logger.debug('chunk is %s', chunk)
 
+                data, dsk, filters, compressor, chunks = get_chunk_encoding(dataset, cache, var)
+
+                try:
+                    _check_chunk_id(data, chunk)
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=str(e)) from e
+
                 cache_key = dataset.attrs.get(DATASET_ID_ATTR_KEY, '') + '/' + f'{var}/{chunk}'
-                response = cache.get(cache_key)
+                echunk = cache.get(cache_key)
 
-                if response is None:
+                if echunk is None:
                     with CostTimer() as ct:
-                        arr_meta = zmetadata['metadata'][f'{var}/{array_meta_key}']
-                        da = zvariables[var].data
-
-                        data_chunk = get_data_chunk(
-                            da,
-                            chunk,
-                            out_shape=arr_meta['chunks'],
-                        )
+                        data_chunk = get_data_chunk(data, chunk, out_shape=chunks, dsk=dsk)
 
                         echunk = encode_chunk(
-                            data_chunk.tobytes(),
-                            filters=arr_meta['filters'],
-                            compressor=arr_meta['compressor'],
+                            data_chunk,
+                            filters=filters,
+                            compressor=compressor,
                         )
 
-                        response = Response(
-                            echunk,
-                            media_type='application/octet-stream',
-                        )
-
-                    cache.put(cache_key, response, ct.time, len(echunk))
-
-                return response
+                    # cache the encoded bytes, the response wrapper is cheap to rebuild
+                    cache.put(cache_key, echunk, ct.time, len(echunk))
+
+                buf = memoryview(echunk).cast('B')
+                if len(buf) > self.stream_threshold:
+                    return StreamingResponse(
+                        _iter_blocks(buf, self.stream_block_size),
+                        media_type='application/octet-stream',
+                        headers={'Content-Length': str(len(buf))},
+                    )
+
+                return Response(
+                    echunk,
+                    media_type='application/octet-stream',
+                )
 
         return router
@@ -1,7 +1,11 @@
-import copy
+import functools
+import json
 import logging
+import math
+from concurrent.futures import ThreadPoolExecutor
 from typing import (
     Any,
+    Mapping,
     Optional,
 )
 
@@ -9,6 +13,8 @@ import cachey
 import dask.array
 import numpy as np
 import xarray as xr
+from dask.optimization import cull
+from numcodecs import Blosc, blosc, get_codec
 from numcodecs.abc import Codec
 from numcodecs.compat import ensure_ndarray
 from xarray.backends.zarr import (
@@ -23,11 +29,17 @@ from zarr.storage import (
     attrs_key,
     default_compressor,
     group_meta_key,
+    normalize_store_arg,
 )
 from zarr.util import normalize_shape
 
 from .api import DATASET_ID_ATTR_KEY
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
 DaskArrayType = (dask.array.Array,)
 ZARR_FORMAT = 2
 ZARR_CONSOLIDATED_FORMAT = 1
@@ -35,6 +47,18 @@ ZARR_METADATA_KEY = '.zmetadata'
 
 logger = logging.getLogger('api')
 
+# Blosc's global thread pool isn't safe to share between the server's worker threads
+blosc.use_threads = False
+
+# Default compressor for numeric arrays without a compressor in their encoding
+NUMERIC_COMPRESSOR = Blosc(cname='zstd', clevel=3, shuffle=Blosc.BITSHUFFLE)
+
+# Rough memory use of a single task in a materialized dask graph
+DASK_TASK_NBYTES = 300
+
+# Shared by all requests that encode several chunks at once, threads are started lazily
+_encode_executor = ThreadPoolExecutor(thread_name_prefix='xpublish-encode')
+
 
 def get_zvariables(dataset: xr.Dataset, cache: cachey.Cache):
     """Returns a dictionary of zarr encoded variables, using the cache when possible."""
@@ -53,9 +77,12 @@ def get_zvariables(dataset: xr.Dataset, cache: cachey.Cache):
 def get_zmetadata(
     dataset: xr.Dataset,
     cache: cachey.Cache,
-    zvariables: dict,
+    zvariables: Optional[dict] = None,
 ):
-    """Returns a consolidated zmetadata dictionary, using the cache when possible."""
+    """Returns a consolidated zmetadata dictionary, using the cache when possible.
+
+    ``zvariables`` is unused and only kept for backwards compatibility.
+    """
     cache_key = dataset.attrs.get(DATASET_ID_ATTR_KEY, '') + '/' + ZARR_METADATA_KEY
     zmeta = cache.get(cache_key)
 
@@ -68,28 +95,203 @@ def get_zmetadata(
     return zmeta
 
 
-def _extract_dataset_zattrs(dataset: xr.Dataset) -> dict:
-    """Helper function to create zattrs dictionary from Dataset global attrs."""
-    zattrs = {}
-    for k, v in dataset.attrs.items():
-        zattrs[k] = encode_zarr_attr_value(v)
+def get_source_zmetadata(
+    dataset: xr.Dataset,
+    cache: cachey.Cache,
+) -> Optional[dict]:
+    """Returns the consolidated zmetadata of the zarr store the dataset was opened from.
 
-    # remove xpublish internal attribute
-    zattrs.pop(DATASET_ID_ATTR_KEY, None)
+    When found, the source zmetadata is cached as the dataset's consolidated zmetadata,
+    so :func:`get_zmetadata` and :func:`get_variable_zmetadata` use it too, instead of
+    creating it from the dataset's variables.
 
-    return zattrs
+    The source zmetadata is only used when it still describes the dataset: the same
+    variables with the same shapes, chunks, dtypes and compressors. It is still up to
+    the caller to only use this for datasets whose attributes were not modified.
+
+    Returns:
+        The source zmetadata, or ``None`` when there is no matching source zmetadata.
+    """
+    dataset_id = dataset.attrs.get(DATASET_ID_ATTR_KEY, '')
+    zmeta = cache.get(dataset_id + '/' + ZARR_METADATA_KEY)
+    found = cache.get(dataset_id + '/' + ZARR_METADATA_KEY + '.source')
+
+    if found is None:
+        zmeta = load_source_zmetadata(dataset)
+        found = zmeta is not None
+
+        # we want to permanently cache this: set high cost value
+        if found:
+            cache.put(dataset_id + '/' + ZARR_METADATA_KEY, zmeta, 99999)
+        cache.put(dataset_id + '/' + ZARR_METADATA_KEY + '.source', found, 99999)
+
+    return zmeta if found else None
+
+
+def get_zvariable(
+    dataset: xr.Dataset,
+    cache: cachey.Cache,
+    var: str,
+):
+    """Returns a single zarr encoded variable, using the cached variables when possible.
+
+    Only the requested variable is encoded, unless all variables are already cached.
+    """
+    zvariables = cache.get(dataset.attrs.get(DATASET_ID_ATTR_KEY, '') + '/' + 'zvariables')
+    if zvariables is not None:
+        return zvariables[var]
+
+    return encode_zarr_variable(dataset.variables[var], name=var)
+
+
+def get_chunk_encoding(
+    dataset: xr.Dataset,
+    cache: cachey.Cache,
+    var: str,
+) -> tuple:
+    """Returns what is needed to encode the chunks of a variable, using the cache when possible.
+
+    Returns:
+        A ``(data, dsk, filters, compressor, chunks)`` tuple, with the encoded variable's
+        data, its materialized task graph if it is a dask array whose graph takes up at
+        most a tenth of the cache (``None`` otherwise), and the resolved codecs and chunk
+        shape of its ``.zarray`` metadata.
+    """
+    # keyed outside of the {var}/{chunk} keys of the encoded chunks
+    cache_key = dataset.attrs.get(DATASET_ID_ATTR_KEY, '') + '/' + f'.chunk_encoding/{var}'
+    chunk_encoding = cache.get(cache_key)
+
+    if chunk_encoding is None:
+        zarray = get_variable_zmetadata(dataset, cache, var)[array_meta_key]
+        data = get_zvariable(dataset, cache, var).data
+
+        # a materialized graph makes computing single chunks cheap, but it is slow to build
+        # for large graphs (seconds for ~1e6 tasks) and is held for as long as it is cached
+        dsk = None
+        nbytes = None
+        if isinstance(data, DaskArrayType):
+            graph = data.__dask_graph__()
+            graph_nbytes = len(graph) * DASK_TASK_NBYTES
+            if graph_nbytes <= cache.available_bytes / 10:
+                dsk = dict(graph)
+                nbytes = graph_nbytes
+
+        chunk_encoding = (
+            data,
+            dsk,
+            zarray['filters'],
+            zarray['compressor'],
+            tuple(zarray['chunks']),
+        )
+
+        # we want to permanently cache this: set high cost value
+        cache.put(cache_key, chunk_encoding, 99999, nbytes)
+
+    return chunk_encoding
+
+
+def get_variable_zmetadata(
+    dataset: xr.Dataset,
+    cache: cachey.Cache,
+    var: str,
+) -> dict:
+    """Returns the ``.zattrs`` and ``.zarray`` metadata of a single variable.
+
+    Uses the consolidated zmetadata when it is already cached, otherwise only the
+    metadata for the requested variable is created (and cached).
+    """
+    dataset_id = dataset.attrs.get(DATASET_ID_ATTR_KEY, '')
+    zmeta = cache.get(dataset_id + '/' + ZARR_METADATA_KEY)
+    if zmeta is not None:
+        return {
+            attrs_key: zmeta['metadata'][f'{var}/{attrs_key}'],
+            array_meta_key: zmeta['metadata'][f'{var}/{array_meta_key}'],
+        }
+
+    # keyed outside of the {var}/{chunk} keys of the encoded chunks
+    cache_key = dataset_id + '/' + f'{ZARR_METADATA_KEY}/{var}'
+    var_zmeta = cache.get(cache_key)
+
+    if var_zmeta is None:
+        var_zmeta = create_variable_zmetadata(dataset, var)
+
+        # we want to permanently cache this: set high cost value
+        cache.put(cache_key, var_zmeta, 99999)
+
+    return var_zmeta
+
+
+def get_zmetadata_json(
+    dataset: xr.Dataset,
+    cache: cachey.Cache,
+    zmetadata: dict,
+) -> bytes:
+    """Returns the serialized consolidated zmetadata, using the cache when possible."""
+    cache_key = dataset.attrs.get(DATASET_ID_ATTR_KEY, '') + '/' + ZARR_METADATA_KEY + '.json'
+    zjson = cache.get(cache_key)
+
+    if zjson is None:
+        zjson = dumps_zmetadata(jsonify_zmetadata(dataset, zmetadata))
+
+        # we want to permanently cache this: set high cost value
+        cache.put(cache_key, zjson, 99999)
+
+    return zjson
+
+
+def _has_nonfinite_float(obj: Any) -> bool:
+    """Helper function to find NaN or infinite floats in a json compatible object."""
+    if isinstance(obj, (float, np.floating)):
+        return not math.isfinite(obj)
+    elif isinstance(obj, dict):
+        return any(_has_nonfinite_float(v) for v in obj.values())
+    elif isinstance(obj, (list, tuple)):
+        return any(_has_nonfinite_float(v) for v in obj)
+    elif isinstance(obj, np.ndarray) and obj.dtype.kind in 'fc':
+        return not np.isfinite(obj).all()
+    return False
+
+
+def dumps_zmetadata(zjson: dict) -> bytes:
+    """Serialize a json compatible zmetadata dictionary to bytes.
+
+    Uses ``orjson`` when it is installed. As ``orjson`` writes NaN and infinite
+    floats as ``null``, metadata containing those falls back to the standard
+    library, which writes them the same way as zarr does.
+    """
+    if orjson is not None and not _has_nonfinite_float(zjson):
+        try:
+            return orjson.dumps(zjson, option=orjson.OPT_SERIALIZE_NUMPY)
+        except orjson.JSONEncodeError:
+            logger.debug('orjson could not serialize zmetadata, using json instead')
+
+    return json.dumps(
+        zjson,
+        ensure_ascii=True,
+        allow_nan=True,
+        separators=(',', ':'),
+    ).encode('ascii')
+
+
+def _fast_encode_attr(value: Any) -> Any:
+    """Helper function to encode an attribute value, skipping the common builtin types."""
+    if type(value) in (str, int, float, bool):
+        return value
+    return encode_zarr_attr_value(value)
+
+
+def _extract_dataset_zattrs(dataset: xr.Dataset) -> dict:
+    """Helper function to create zattrs dictionary from Dataset global attrs."""
+    # skip xpublish internal attribute
+    return {k: _fast_encode_attr(v) for k, v in dataset.attrs.items() if k != DATASET_ID_ATTR_KEY}
 
 
 def _extract_dataarray_zattrs(da: xr.DataArray) -> dict:
     """Helper function to extract zattrs dictionary from DataArray."""
-    zattrs = {}
-    for k, v in da.attrs.items():
-        zattrs[k] = encode_zarr_attr_value(v)
-    zattrs[DIMENSION_KEY] = list(da.dims)
-
     # We don't want `_FillValue` in `.zattrs`
     # It should go in `fill_value` section of `.zarray`
-    _ = zattrs.pop('_FillValue', None)
+    zattrs = {k: _fast_encode_attr(v) for k, v in da.attrs.items() if k != '_FillValue'}
+    zattrs[DIMENSION_KEY] = list(da.dims)
 
     return zattrs
 
@@ -109,13 +311,24 @@ def _extract_dataarray_coords(
     return zattrs
 
 
+@functools.lru_cache(maxsize=1024, typed=True)
+def _encode_fill_value_cached(fill_value: Any, dtype: np.dtype, fill_value_bits: bytes) -> Any:
+    return encode_fill_value(fill_value, dtype)
+
+
 def _extract_fill_value(
     da: xr.DataArray,
     dtype: np.dtype,
 ) -> Any:
     """Helper function to extract fill value from DataArray."""
-    fill_value = da.attrs.pop('_FillValue', None)
-    return encode_fill_value(fill_value, dtype)
+    fill_value = da.attrs.get('_FillValue', None)
+    # variables of a dataset mostly share a handful of fill values. The exact bits are part
+    # of the key, as values that compare equal (0.0 and -0.0) can encode differently
+    try:
+        return _encode_fill_value_cached(fill_value, dtype, np.asarray(fill_value).tobytes())
+    except TypeError:
+        # unhashable fill value
+        return encode_fill_value(fill_value, dtype)
 
 
 def _extract_zarray(
@@ -124,8 +337,15 @@ def _extract_zarray(
     dtype: np.dtype,
 ) -> dict:
     """Helper function to extract zarr array metadata."""
+    if dtype.kind in 'iuf':
+        fallback_compressor = NUMERIC_COMPRESSOR
+    else:
+        fallback_compressor = default_compressor
+
     meta = {
-        'compressor': encoding.get('compressor', da.encoding.get('compressor', default_compressor)),
+        'compressor': encoding.get(
+            'compressor', da.encoding.get('compressor', fallback_compressor)
+        ),
         'filters': encoding.get('filters', da.encoding.get('filters', None)),
         'chunks': encoding.get('chunks', None),
         'dtype': dtype.str,
@@ -152,6 +372,67 @@ def _extract_zarray(
     return meta
 
 
+def _source_zarray_matches(var: xr.Variable, zarray: dict) -> bool:
+    """Helper function to check that source array metadata still describes a variable."""
+    if isinstance(var.data, DaskArrayType):
+        var_chunks = [c[0] for c in var.data.chunks]
+    else:
+        var_chunks = list(var.shape)
+
+    return (
+        'compressor' in var.encoding
+        and zarray['shape'] == list(normalize_shape(var.shape))
+        and zarray['chunks'] == var_chunks
+        and np.dtype(zarray['dtype']) == np.dtype(var.encoding.get('dtype', var.dtype))
+        and zarray['compressor'] == var.encoding.get('compressor')
+        and (zarray['filters'] or None) == (var.encoding.get('filters') or None)
+    )
+
+
+def load_source_zmetadata(dataset: xr.Dataset) -> Optional[dict]:
+    """Helper function to load the consolidated zmetadata of a dataset's zarr source.
+
+    The codec configurations of the source are converted to codecs, as in the
+    zmetadata created by :func:`create_zmetadata`.
+
+    Returns:
+        The source zmetadata, or ``None`` if the dataset wasn't opened from a zarr store
+        with consolidated metadata, or if that doesn't match the dataset's variables.
+    """
+    source = dataset.encoding.get('source')
+    if not source:
+        return None
+
+    try:
+        store = normalize_store_arg(source, mode='r')
+        zmeta = json.loads(store[ZARR_METADATA_KEY])
+    except (KeyError, OSError, ValueError, ImportError) as e:
+        logger.debug('no consolidated zmetadata found in source %s: %s', source, e)
+        return None
+
+    metadata = zmeta.get('metadata', {})
+    array_keys = {
+        key[: -len(array_meta_key) - 1] for key in metadata if key.endswith(array_meta_key)
+    }
+    if array_keys != set(dataset.variables) or group_meta_key not in metadata:
+        return None
+
+    for key, var in dataset.variables.items():
+        zarray = dict(metadata[f'{key}/{array_meta_key}'])
+        if zarray['compressor'] is not None:
+            zarray['compressor'] = get_codec(zarray['compressor'])
+        if zarray['filters']:
+            zarray['filters'] = [get_codec(f) for f in zarray['filters']]
+
+        if not _source_zarray_matches(var, zarray):
+            logger.debug('source zmetadata of %s does not match the dataset', key)
+            return None
+
+        metadata[f'{key}/{array_meta_key}'] = zarray
+
+    return zmeta
+
+
 def create_zvariables(dataset: xr.Dataset) -> dict:
     """Helper function to create a dictionary of zarr encoded variables."""
     zvariables = {}
@@ -163,27 +444,48 @@ def create_zvariables(dataset: xr.Dataset) -> dict:
     return zvariables
 
 
+def create_group_zmetadata(dataset: xr.Dataset) -> dict:
+    """Helper function to create the group level (``.zgroup``, ``.zattrs``) zmetadata."""
+    return {
+        group_meta_key: {'zarr_format': ZARR_FORMAT},
+        attrs_key: _extract_dataset_zattrs(dataset),
+    }
+
+
+def create_variable_zmetadata(dataset: xr.Dataset, key: str) -> dict:
+    """Helper function to create the ``.zattrs`` and ``.zarray`` metadata of a variable."""
+    dvar = dataset.variables[key]
+    da = dataset[key]
+    encoded_da = encode_zarr_variable(dvar, name=key)
+    encoding = extract_zarr_variable_encoding(dvar)
+    zattrs = _extract_dataarray_zattrs(encoded_da)
+    zattrs = _extract_dataarray_coords(da, zattrs)
+
+    return {
+        attrs_key: zattrs,
+        array_meta_key: _extract_zarray(
+            encoded_da,
+            encoding,
+            encoded_da.dtype,
+        ),
+    }
+
+
 def create_zmetadata(dataset: xr.Dataset) -> dict:
     """Helper function to create a consolidated zmetadata dictionary."""
     zmeta = {
         'zarr_consolidated_format': ZARR_CONSOLIDATED_FORMAT,
-        'metadata': {},
+        'metadata': create_group_zmetadata(dataset),
     }
-    zmeta['metadata'][group_meta_key] = {'zarr_format': ZARR_FORMAT}
-    zmeta['metadata'][attrs_key] = _extract_dataset_zattrs(dataset)
-
-    for key, dvar in dataset.variables.items():
-        da = dataset[key]
-        encoded_da = encode_zarr_variable(dvar, name=key)
-        encoding = extract_zarr_variable_encoding(dvar)
-        zattrs = _extract_dataarray_zattrs(encoded_da)
-        zattrs = _extract_dataarray_coords(da, zattrs)
-        zmeta['metadata'][f'{key}/{attrs_key}'] = zattrs
-        zmeta['metadata'][f'{key}/{array_meta_key}'] = _extract_zarray(
-            encoded_da,
-            encoding,
-            encoded_da.dtype,
-        )
+
+    # variables are independent of each other, so their metadata is built concurrently
+    keys = list(dataset.variables)
+    with ThreadPoolExecutor(max_workers=max(1, min(32, len(keys)))) as executor:
+        var_zmetas = executor.map(functools.partial(create_variable_zmetadata, dataset), keys)
+
+        for key, var_zmeta in zip(keys, var_zmetas):
+            zmeta['metadata'][f'{key}/{attrs_key}'] = var_zmeta[attrs_key]
+            zmeta['metadata'][f'{key}/{array_meta_key}'] = var_zmeta[array_meta_key]
 
     return zmeta
 
@@ -193,18 +495,19 @@ def jsonify_zmetadata(
     zmetadata: dict,
 ) -> dict:
     """Helper function to convert zmetadata dictionary to a json compatible dictionary."""
-    zjson = copy.deepcopy(zmetadata)
+    # shallow copy, only the array metadata with a compressor needs to be rebuilt
+    metadata = dict(zmetadata['metadata'])
 
     for key in list(dataset.variables):
         # convert compressor to dict
-        compressor = zjson['metadata'][f'{key}/{array_meta_key}']['compressor']
+        zarray_key = f'{key}/{array_meta_key}'
+        compressor = metadata[zarray_key]['compressor']
         if compressor is not None:
-            compressor_config = zjson['metadata'][f'{key}/{array_meta_key}'][
-                'compressor'
-            ].get_config()
-            zjson['metadata'][f'{key}/{array_meta_key}']['compressor'] = compressor_config
+            zarray = dict(metadata[zarray_key])
+            zarray['compressor'] = compressor.get_config()
+            metadata[zarray_key] = zarray
 
-    return zjson
+    return {**zmetadata, 'metadata': metadata}
 
 
 def encode_chunk(
@@ -212,14 +515,24 @@ def encode_chunk(
     filters: Optional[list[Codec]] = None,
     compressor: Optional[Codec] = None,
 ) -> np.typing.ArrayLike:
-    """Helper function largely copied from zarr.Array."""
+    """Helper function largely copied from zarr.Array.
+
+    Numpy arrays are passed to the codecs through the buffer protocol rather than
+    being copied to bytes first. Encoded arrays (without a compressor, or from codecs
+    that return arrays) are returned as a flat ``memoryview`` of their bytes, which
+    responses can send without another copy.
+    """
+    if isinstance(chunk, np.ndarray) and not chunk.flags['C_CONTIGUOUS']:
+        chunk = np.ascontiguousarray(chunk)
+
     # apply filters
     if filters:
         for f in filters:
             chunk = f.encode(chunk)
 
-    # check object encoding
-    if ensure_ndarray(chunk).dtype == object:
+    # check object encoding, only wrapping buffers that aren't arrays already
+    dtype = chunk.dtype if isinstance(chunk, np.ndarray) else ensure_ndarray(chunk).dtype
+    if dtype.kind == 'O':
         raise RuntimeError('cannot write object array without object codec')
 
     # compress
@@ -228,27 +541,102 @@ def encode_chunk(
     else:
         cdata = chunk
 
+    return _as_byte_view(cdata)
+
+
+def _as_byte_view(cdata: Any) -> Any:
+    """Helper function to return encoded arrays as a flat ``memoryview`` of their bytes.
+
+    This also covers dtypes that don't support the buffer protocol.
+    """
+    if isinstance(cdata, np.ndarray):
+        cdata = memoryview(np.ascontiguousarray(cdata).reshape(-1).view(np.uint8))
+
     return cdata
 
 
+@functools.lru_cache(maxsize=4096)
+def _parse_chunk_id(chunk_id: str, ndim: int) -> tuple:
+    """Helper function to parse a chunk_id (e.g. ``'0.1.2'``) into chunk indices."""
+    ikeys = tuple(int(s) for s in chunk_id.split('.'))
+
+    # zarr uses a single index for the chunk of 0-d arrays
+    if len(ikeys) != max(ndim, 1):
+        raise ValueError('Invalid chunk_id for an array with %s dimensions: %s' % (ndim, chunk_id))
+
+    return ikeys
+
+
+def _check_chunk_id(da: Any, chunk_id: str) -> tuple:
+    """Helper function to parse a chunk_id and check that it is in the chunk grid of an array."""
+    ikeys = _parse_chunk_id(chunk_id, da.ndim)
+
+    if isinstance(da, DaskArrayType):
+        numblocks = da.numblocks or (1,)
+        if any(not 0 <= i < n for i, n in zip(ikeys, numblocks)):
+            raise ValueError(
+                'Invalid chunk_id for an array with %s chunks: %s' % (numblocks, chunk_id)
+            )
+    elif ikeys != (0,) * max(da.ndim, 1):
+        raise ValueError(
+            'Invalid chunk_id for numpy array: %s. Should have been: %s'
+            % (chunk_id, ((0,) * da.ndim))
+        )
+
+    return ikeys
+
+
+def encode_chunks(
+    chunks: list[np.typing.ArrayLike],
+    filters: Optional[list[Codec]] = None,
+    compressor: Optional[Codec] = None,
+) -> list[np.typing.ArrayLike]:
+    """Encode several chunks that share the same filters and compressor.
+
+    Compressors that provide an ``encode_batch`` method encode all chunks in one call
+    when there are no filters. Otherwise chunks are encoded in a thread pool, as the
+    codecs release the GIL while encoding.
+    """
+    if compressor is not None and not filters and hasattr(compressor, 'encode_batch'):
+        chunks = [np.ascontiguousarray(chunk) for chunk in chunks]
+        if any(chunk.dtype.kind == 'O' for chunk in chunks):
+            raise RuntimeError('cannot write object array without object codec')
+        return [_as_byte_view(cdata) for cdata in compressor.encode_batch(chunks)]
+
+    if len(chunks) < 2:
+        return [encode_chunk(chunk, filters=filters, compressor=compressor) for chunk in chunks]
+
+    return list(
+        _encode_executor.map(
+            functools.partial(encode_chunk, filters=filters, compressor=compressor),
+            chunks,
+        )
+    )
+
+
 def get_data_chunk(
     da: xr.DataArray,
     chunk_id: str,
     out_shape: tuple,
+    dsk: Optional[Mapping] = None,
 ) -> np.typing.ArrayLike:
     """Get one chunk of data from this DataArray (da).
 
     If this is an incomplete edge chunk, pad the returned array to match out_shape.
+
+    For dask arrays, ``dsk`` may be given as the array's materialized task graph. The
+    chunk is then computed from only the tasks it depends on, skipping the graph
+    construction and optimization of a full ``compute()`` on every request.
     """
-    ikeys = tuple(map(int, chunk_id.split('.')))
-    if isinstance(da, DaskArrayType):
+    ikeys = _check_chunk_id(da, chunk_id)
+    if isinstance(da, DaskArrayType) and dsk is not None:
+        key = (da.name,) + ikeys[: da.ndim]
+        chunk_dsk, _ = cull(dsk, [key])
+        chunk_data = dask.base.get_scheduler(collections=[da])(chunk_dsk, key)
+    elif isinstance(da, DaskArrayType):
         chunk_data = da.blocks[ikeys]
     else:
-        if da.ndim > 0 and ikeys != ((0,) * da.ndim):
-            raise ValueError(
-                'Invalid chunk_id for numpy array: %s. Should have been: %s'
-                % (chunk_id, ((0,) * da.ndim))
-            )
+        # numpy arrays are a single chunk, checked by _check_chunk_id
         chunk_data = np.asarray(da)
 
     logger.debug('checking chunk output size, %s == %s' % (chunk_data.shape, out_shape))
@@ -257,10 +645,14 @@ def get_data_chunk(
         chunk_data = chunk_data.compute()
 
     # zarr expects full edge chunks, contents out of bounds for the array are undefined
-    if chunk_data.shape != tuple(out_shape):
-        new_chunk = np.empty_like(chunk_data, shape=out_shape)
-        write_slice = tuple([slice(0, s) for s in chunk_data.shape])
-        new_chunk[write_slice] = chunk_data
+    out_shape = tuple(out_shape)
+    if chunk_data.shape != out_shape:
+        new_chunk = np.empty(out_shape, dtype=chunk_data.dtype)
+        if chunk_data.shape[1:] == out_shape[1:]:
+            # only short along the first axis, the data is a contiguous prefix of the chunk
+            new_chunk.reshape(-1)[: chunk_data.size] = chunk_data.reshape(-1)
+        else:
+            new_chunk[tuple(map(slice, chunk_data.shape))] = chunk_data
         return new_chunk
     else:
         return chunk_data